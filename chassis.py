@@ -1,11 +1,11 @@
 import csv
 import logging
-import traceback
 import intersight
-import intersight.api.compute_api
-import intersight.api.equipment_api # Required for fetching chassis information
 import credentials # Assuming this module handles API client setup and CLI arguments
+import intersight_inventory # Shared, cached chassis and blade inventory fetching
 import argparse # For argument parsing
+from collections import Counter, defaultdict
+from intersight_inventory import DEFAULT_CACHE_TTL, MISSING_ATTRIBUTE
 
 # Standard logging format
 FORMAT = '%(asctime)-15s [%(levelname)s] [%(filename)s:%(lineno)s] %(message)s'
@@ -19,9 +19,25 @@ CHASSIS_SLOT_COUNTS = {
     "UCSX-9508": 8,
 }
 DEFAULT_SLOT_COUNT = 8
+_warned_models = set()  # Unknown chassis models already reported, so large fleets warn once per model
 
 # --- Configuration: Two-Slot Blade Models ---
-TWO_SLOT_MODELS = {"UCSX-410C-M7", "UCSB-B480-M5"}
+TWO_SLOT_MODELS = frozenset({"UCSX-410C-M7", "UCSB-B480-M5"})
+
+# --- Configuration: CSV output ---
+CSV_WRITE_BUFFER_SIZE = 1 << 20  # 1 MiB, so rows reach the file in a few large writes
+# Slot rows are written directly, terminated like csv.writer's default dialect
+CSV_LINE_TERMINATOR = '\r\n'
+CSV_SPECIAL_CHARS = (',', '"', '\r', '\n')
+
+def csv_escape(value):
+    """Formats a single CSV field, quoting it only when needed (same output as csv.QUOTE_MINIMAL)."""
+    if value is None:
+        return ''
+    value = str(value)
+    if any(char in value for char in CSV_SPECIAL_CHARS):
+        return '"' + value.replace('"', '""') + '"'
+    return value
 
 def main():
     if isinstance(credentials.Parser, argparse.ArgumentParser):
@@ -36,6 +52,12 @@ def main():
     except argparse.ArgumentError:
         logger.info("'--csv_file' argument already defined by credentials.Parser or a parent parser.")
 
+    try:
+        parser.add_argument('--cache-ttl', type=int, default=DEFAULT_CACHE_TTL,
+                            help=f'Seconds to reuse a cached chassis/blade inventory instead of querying Intersight (0 disables). The default is {DEFAULT_CACHE_TTL}.')
+    except argparse.ArgumentError:
+        logger.info("'--cache-ttl' argument already defined by credentials.Parser or a parent parser.")
+
     client = credentials.config_credentials(parser)
 
     try:
@@ -44,67 +66,53 @@ def main():
         logger.error(f"Argument parsing failed. Ensure all required arguments are provided. Error: {e}")
         return
 
-    model_summary_counts = {}
+    model_summary_counts = defaultdict(Counter)
 
     try:
-        compute_api_instance = intersight.api.compute_api.ComputeApi(client)
-        equipment_api_instance = intersight.api.equipment_api.EquipmentApi(client)
-
-        with open(args.csv_file, 'w', newline='') as csvfile:
+        with open(args.csv_file, 'w', newline='', buffering=CSV_WRITE_BUFFER_SIZE) as csvfile:
             fieldnames = ['Chassis', 'ChassisModel', 'ChassisSerial', 'Slot', 'BladeModel', 'BladeSerial', 'OperState']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-
-            logger.info("Fetching chassis list from Intersight...")
-            all_chassis_response = equipment_api_instance.get_equipment_chassis_list(
-                select='Moid,Name,Model,OperState,Serial'
-            )
-
-            if not all_chassis_response or not hasattr(all_chassis_response, 'results') or not all_chassis_response.results:
-                logger.info("No chassis found in Intersight or unexpected API response format.")
-                return
+            writer = csv.writer(csvfile)
+            writer.writerow(fieldnames)
 
-            logger.info(f"Found {len(all_chassis_response.results)} chassis. Processing each...")
-
-            for chassis in all_chassis_response.results:
-                chassis_name = chassis.name if hasattr(chassis, 'name') and chassis.name else "UnknownChassis"
-                chassis_moid = chassis.moid if hasattr(chassis, 'moid') else "UnknownMoid"
-                chassis_model_str = chassis.model if hasattr(chassis, 'model') and chassis.model else "UNKNOWN_MODEL"
-                chassis_serial_str = chassis.serial if hasattr(chassis, 'serial') and chassis.serial else "UnknownSerial"
+            logger.info("Fetching chassis and blade inventory from Intersight...")
+            chassis_count = 0
+            for chassis, chassis_blades in intersight_inventory.iter_inventory(client, cache_ttl=args.cache_ttl):
+                chassis_count += 1
+                chassis_name = getattr(chassis, 'name', None) or "UnknownChassis"
+                chassis_model_str = getattr(chassis, 'model', None) or "UNKNOWN_MODEL"
+                chassis_serial_str = getattr(chassis, 'serial', None) or "UnknownSerial"
 
                 reported_chassis_oper_state = "UnknownChassisState"
-                if hasattr(chassis, 'oper_state'):
-                    chassis_state_val = chassis.oper_state
-                    if isinstance(chassis_state_val, str) and chassis_state_val.strip():
-                        reported_chassis_oper_state = chassis_state_val.strip()
-                    elif isinstance(chassis_state_val, str) and not chassis_state_val.strip():
-                        reported_chassis_oper_state = "operable"
-                    elif chassis_state_val is None:
-                        reported_chassis_oper_state = "NotReported (ChassisState_is_None)"
-                else:
-                    logger.warning(f"Chassis '{chassis_name}' is missing OperState attribute.")
-
-                total_slots = CHASSIS_SLOT_COUNTS.get(chassis_model_str, DEFAULT_SLOT_COUNT)
-
-                logger.info(f"Processing Chassis: '{chassis_name}', Model: '{chassis_model_str}', Serial: '{chassis_serial_str}', Slots: {total_slots}")
-
-                blades_in_chassis_response = compute_api_instance.get_compute_blade_list(
-                    filter=f"EquipmentChassis.Moid eq '{chassis_moid}'",
-                    select='SlotId,Moid,Model,Serial'
-                )
+                chassis_state_val = getattr(chassis, 'oper_state', MISSING_ATTRIBUTE)
+                if isinstance(chassis_state_val, str):
+                    reported_chassis_oper_state = chassis_state_val.strip() or "operable"
+                elif chassis_state_val is None:
+                    reported_chassis_oper_state = "NotReported (ChassisState_is_None)"
+                elif chassis_state_val is MISSING_ATTRIBUTE:
+                    logger.warning("Chassis '%s' is missing OperState attribute.", chassis_name)
+
+                total_slots = CHASSIS_SLOT_COUNTS.get(chassis_model_str)
+                if total_slots is None:
+                    total_slots = DEFAULT_SLOT_COUNT
+                    if chassis_model_str not in _warned_models:
+                        _warned_models.add(chassis_model_str)
+                        logger.warning("Chassis model '%s' is not in CHASSIS_SLOT_COUNTS; assuming %d slots.", chassis_model_str, DEFAULT_SLOT_COUNT)
+
+                logger.info("Processing Chassis: '%s', Model: '%s', Serial: '%s', Slots: %d", chassis_name, chassis_model_str, chassis_serial_str, total_slots)
 
                 populated_slots_details = {}
-                if blades_in_chassis_response and hasattr(blades_in_chassis_response, 'results') and blades_in_chassis_response.results:
-                    for blade in blades_in_chassis_response.results:
-                        if hasattr(blade, 'slot_id') and blade.slot_id is not None:
-                            try:
-                                slot_id = int(blade.slot_id)
-                                populated_slots_details[slot_id] = {
-                                    'model': getattr(blade, 'model', 'UnknownBladeModel'),
-                                    'serial': getattr(blade, 'serial', 'UnknownBladeSerial')
-                                }
-                            except ValueError:
-                                logger.warning(f"Could not parse SlotId '{blade.slot_id}' for a blade in chassis '{chassis_name}'.")
+                for blade in chassis_blades:
+                    raw_slot_id = getattr(blade, 'slot_id', None)
+                    if raw_slot_id is not None:
+                        try:
+                            # The SDK normally returns SlotId as an int already; only convert other representations
+                            slot_id = raw_slot_id if isinstance(raw_slot_id, int) else int(raw_slot_id)
+                            populated_slots_details[slot_id] = {
+                                'model': getattr(blade, 'model', 'UnknownBladeModel'),
+                                'serial': getattr(blade, 'serial', 'UnknownBladeSerial')
+                            }
+                        except ValueError:
+                            logger.warning("Could not parse SlotId '%s' for a blade in chassis '%s'.", raw_slot_id, chassis_name)
 
                 # For CSV output: expand details to cover all slots occupied by multi-slot blades
                 expanded_slots_details = {}
@@ -116,83 +124,77 @@ def main():
                             expanded_slots_details[next_slot_id] = details
 
                 # --- MODIFICATION START: Corrected Summary Calculation ---
-                model_summary_counts.setdefault(chassis_model_str, {})
+                model_status_counts = model_summary_counts[chassis_model_str]
 
-                # 1. Count each populated blade once towards its status.
-                for details in populated_slots_details.values():
-                    status = reported_chassis_oper_state
-                    model_summary_counts[chassis_model_str].setdefault(status, 0)
-                    model_summary_counts[chassis_model_str][status] += 1
+                # 1. Count each populated blade once towards its status (all blades share the chassis status).
+                if populated_slots_details:
+                    model_status_counts[reported_chassis_oper_state] += len(populated_slots_details)
 
                 # 2. Calculate the number of total slots occupied by blades.
-                slots_occupied_by_blades = 0
-                for details in populated_slots_details.values():
-                    slots_occupied_by_blades += 2 if details['model'] in TWO_SLOT_MODELS else 1
+                slots_occupied_by_blades = sum(2 if details['model'] in TWO_SLOT_MODELS else 1 for details in populated_slots_details.values())
 
                 # 3. Add the count of empty slots to the summary.
                 num_empty_slots = total_slots - slots_occupied_by_blades
                 if num_empty_slots > 0:
-                    model_summary_counts[chassis_model_str].setdefault("Empty", 0)
-                    model_summary_counts[chassis_model_str]["Empty"] += num_empty_slots
+                    model_status_counts["Empty"] += num_empty_slots
                 # --- MODIFICATION END ---
 
-                # Loop to write each slot's status to the CSV (summary is no longer calculated here)
+                # Build each slot's status row, then write the whole chassis in one call (summary is no longer calculated here)
+                # Chassis columns are identical for every slot, so escape them once
+                row_prefix = f"{csv_escape(chassis_name)},{csv_escape(chassis_model_str)},{csv_escape(chassis_serial_str)},"
+                rows_buf = []
                 for slot_num in range(1, total_slots + 1):
                     final_oper_state_for_csv = "Empty"
                     current_blade_model = ""
                     current_blade_serial = ""
 
-                    if slot_num in expanded_slots_details:
-                        details = expanded_slots_details[slot_num]
+                    details = expanded_slots_details.get(slot_num)
+                    if details is not None:
                         final_oper_state_for_csv = reported_chassis_oper_state
                         current_blade_model = details['model']
                         current_blade_serial = details['serial']
 
-                    writer.writerow({
-                        'Chassis': chassis_name,
-                        'ChassisModel': chassis_model_str,
-                        'ChassisSerial': chassis_serial_str,
-                        'Slot': slot_num,
-                        'BladeModel': current_blade_model,
-                        'BladeSerial': current_blade_serial,
-                        'OperState': final_oper_state_for_csv
-                    })
+                    rows_buf.append(
+                        f"{row_prefix}{slot_num},{csv_escape(current_blade_model)},"
+                        f"{csv_escape(current_blade_serial)},{csv_escape(final_oper_state_for_csv)}{CSV_LINE_TERMINATOR}"
+                    )
+                csvfile.writelines(rows_buf)
 
-                logger.info(f"Finished writing slot information for chassis '{chassis_name}'.")
+                logger.info("Finished writing slot information for chassis '%s'.", chassis_name)
 
-            logger.info(f"Successfully wrote blade slot information to '{args.csv_file}'")
+            if not chassis_count:
+                logger.info("No chassis found in Intersight or unexpected API response format.")
+                return
+
+            logger.info("Successfully wrote blade slot information for %d chassis to '%s'", chassis_count, args.csv_file)
 
-            # --- Append Summary Section (no changes here) ---
+            # --- Append Summary Section ---
             logger.info("Appending summary of slot statuses per chassis model...")
-            writer.writerow({})
-            writer.writerow({})
-            summary_title_row = {field: '' for field in fieldnames}
-            summary_title_row['Chassis'] = "--- Summary by Chassis Model ---"
-            writer.writerow(summary_title_row)
-            summary_header_row = {field: '' for field in fieldnames}
-            summary_header_row['Chassis'] = "Chassis Model"
-            summary_header_row['ChassisModel'] = "Slot Status"
-            summary_header_row['ChassisSerial'] = "Count"
-            writer.writerow(summary_header_row)
-
-            for model, status_counts in model_summary_counts.items():
-                for status, count in status_counts.items():
-                    summary_data_row = {field: '' for field in fieldnames}
-                    summary_data_row['Chassis'] = model
-                    summary_data_row['ChassisModel'] = status
-                    summary_data_row['ChassisSerial'] = count
-                    writer.writerow(summary_data_row)
+            # Built as one string and written in a single call; trailing commas pad rows to the full column count
+            blank_row = ',' * (len(fieldnames) - 1)
+            padding = ',' * (len(fieldnames) - 3)
+            summary_lines = [
+                blank_row + CSV_LINE_TERMINATOR,
+                blank_row + CSV_LINE_TERMINATOR,
+                "--- Summary by Chassis Model ---" + blank_row + CSV_LINE_TERMINATOR,
+                "Chassis Model,Slot Status,Count" + padding + CSV_LINE_TERMINATOR,
+            ]
+            summary_lines.extend(
+                f"{csv_escape(model)},{csv_escape(status)},{count}{padding}{CSV_LINE_TERMINATOR}"
+                for model, status_counts in model_summary_counts.items()
+                for status, count in status_counts.items()
+            )
+            csvfile.write(''.join(summary_lines))
             
             logger.info("Summary appended successfully.")
 
     except intersight.OpenApiException as e:
-        error_details = f"Status: {e.status}, Reason: {e.reason}"
-        if e.body: error_details += f", Body: {e.body[:500]}..."
-        logger.error(f"Intersight API Exception occurred: {error_details}")
-        traceback.print_exc()
+        if e.body:
+            logger.exception("Intersight API Exception occurred: Status: %s, Reason: %s, Body: %.500s...", e.status, e.reason, e.body)
+        else:
+            logger.exception("Intersight API Exception occurred: Status: %s, Reason: %s", e.status, e.reason)
     except Exception as e:
-        logger.error(f"An unexpected error occurred: {e}")
-        traceback.print_exc()
+        logger.exception("An unexpected error occurred: %s", e)
 
 if __name__ == "__main__":
     main()
@@ -18,6 +18,7 @@ import datetime
 import re
 
 import intersight
+from urllib3.util.retry import Retry
 
 # This argument parser instance should be used within scripts where additional CLI arguments are required
 Parser = argparse.ArgumentParser(description='Intersight Python SDK credential lookup')
@@ -100,6 +101,13 @@ def config_credentials(description=None):
         configuration.verify_ssl = False
 
     configuration.proxy = args.https_proxy
+    # Keep-alive connections shared by all API instances built from this client. Ensure room for scripts that
+    # issue requests from a thread pool, without lowering the SDK default (cpu_count() * 5) on larger hosts
+    configuration.connection_pool_maxsize = max(configuration.connection_pool_maxsize, 32)
+    # Retry throttled and transient server errors with backoff instead of failing the whole run. Once retries
+    # are exhausted the last response is returned (raise_on_status=False), so it still surfaces as an ApiException
+    configuration.retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+                                  raise_on_status=False)
     api_client = intersight.ApiClient(configuration)
     api_client.set_default_header('referer', args.url)
     api_client.set_default_header('x-requested-with', 'XMLHttpRequest')
@@ -0,0 +1,297 @@
+"""Intersight Chassis and Blade Inventory Helper
+
+This module provides helpers for fetching the chassis and blade inventory shared by the scripts
+in this directory. Chassis are requested page by page with their blades expanded server-side
+(falling back to batched blade queries), and the result is cached in memory and on disk under
+~/.cache/intersight so repeated runs within the cache TTL do not query Intersight again.
+
+Typical use:
+
+    client = credentials.config_credentials(parser)
+    for chassis, blades in intersight_inventory.iter_inventory(client, cache_ttl=30):
+        ...
+
+"""
+
+
+import hashlib
+import logging
+import os
+import pickle
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor # For overlapping batched blade requests
+from types import SimpleNamespace
+
+import intersight
+import intersight.api.compute_api
+import intersight.api.equipment_api
+import urllib3
+
+logger = logging.getLogger('openapi')
+
+# --- Configuration: Inventory queries ---
+CHASSIS_SELECT = 'Moid,Name,Model,OperState,Serial'
+BLADE_SELECT = 'SlotId,Moid,Model,Serial'
+CHASSIS_PAGE_SIZE = 100  # Chassis per page; the next page is fetched while the caller processes the current one
+PAGE_QUEUE_POLL_INTERVAL = 0.5  # Seconds between checks whether the caller stopped reading pages
+
+# --- Configuration: Batched blade fetches ---
+BLADE_FETCH_WORKERS = 16       # Upper bound on concurrent chunk requests; with 100-chassis pages only ceil(100/40) = 3 are needed
+BLADE_FILTER_CHUNK_SIZE = 40   # Chassis Moids per 'in' filter, keeps the request URL well under length limits
+BLADE_PAGE_SIZE = 1000         # Maximum $top accepted by Intersight
+
+# Sentinel for SDK model attributes that were not returned (they raise instead of being None)
+MISSING_ATTRIBUTE = object()
+
+# --- Configuration: Inventory cache ---
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'intersight')
+DEFAULT_CACHE_TTL = 30  # Seconds a cached inventory is reused without querying Intersight
+CHASSIS_CACHE_FIELDS = ('moid', 'name', 'model', 'oper_state', 'serial')
+BLADE_CACHE_FIELDS = ('moid', 'slot_id', 'model', 'serial')
+_recent_inventories = {}  # cache path -> (TTL window, inventory), so scripts run in one process share a fetch
+
+def get_blades_for_chassis_moids(compute_api_instance, chassis_moids):
+    """Returns all blades in the given chassis using a single 'in' filter, following pages as needed."""
+    moid_filter = "EquipmentChassis.Moid in (" + ",".join(f"'{moid}'" for moid in chassis_moids) + ")"
+    blades = []
+    skip = 0
+    while True:
+        blades_response = compute_api_instance.get_compute_blade_list(
+            filter=moid_filter,
+            select=BLADE_SELECT + ',EquipmentChassis',
+            orderby='Moid',  # Stable order so $top/$skip pages neither repeat nor skip blades
+            top=BLADE_PAGE_SIZE,
+            skip=skip
+        )
+        page = blades_response.results if blades_response and hasattr(blades_response, 'results') and blades_response.results else []
+        blades.extend(page)
+        if len(page) < BLADE_PAGE_SIZE:
+            return blades
+        skip += BLADE_PAGE_SIZE
+
+def get_blades_by_chassis(compute_api_instance, chassis_moids):
+    """Fetches blades for all chassis in batches and groups them by parent chassis Moid."""
+    chunks = [chassis_moids[i:i + BLADE_FILTER_CHUNK_SIZE] for i in range(0, len(chassis_moids), BLADE_FILTER_CHUNK_SIZE)]
+    blades_by_chassis = defaultdict(list)
+    if not chunks:
+        return blades_by_chassis
+    with ThreadPoolExecutor(max_workers=min(BLADE_FETCH_WORKERS, len(chunks))) as executor:
+        for blades in executor.map(lambda chunk: get_blades_for_chassis_moids(compute_api_instance, chunk), chunks):
+            for blade in blades:
+                parent = getattr(blade, 'equipment_chassis', None)
+                parent_moid = getattr(parent, 'moid', None)
+                if parent_moid:
+                    blades_by_chassis[parent_moid].append(blade)
+                else:
+                    logger.warning("Blade '%s' has no parent chassis reference; skipping.", getattr(blade, 'moid', 'UnknownMoid'))
+    return blades_by_chassis
+
+class BladesNotExpandedError(Exception):
+    """Raised when a chassis query asked for expanded Blades but the server returned bare references."""
+
+def get_chassis_page(equipment_api_instance, compute_api_instance, skip, expand_blades):
+    """Fetches one page of chassis together with their blades.
+
+    With expand_blades the blades are returned server-side in the same response via $expand,
+    otherwise they are fetched with batched blade queries.
+
+    Returns:
+        (chassis_list, blades_by_chassis): chassis results and their blades keyed by chassis Moid
+    """
+    if expand_blades:
+        chassis_response = equipment_api_instance.get_equipment_chassis_list(
+            select=CHASSIS_SELECT + ',Blades',
+            expand=f'Blades($select={BLADE_SELECT})',
+            orderby='Moid',  # Stable order so $top/$skip pages neither repeat nor skip chassis
+            top=CHASSIS_PAGE_SIZE,
+            skip=skip
+        )
+    else:
+        chassis_response = equipment_api_instance.get_equipment_chassis_list(
+            select=CHASSIS_SELECT,
+            orderby='Moid',
+            top=CHASSIS_PAGE_SIZE,
+            skip=skip
+        )
+    chassis_list = chassis_response.results if chassis_response and hasattr(chassis_response, 'results') and chassis_response.results else []
+    chassis_moids = [chassis.moid for chassis in chassis_list if getattr(chassis, 'moid', None)]
+
+    if not expand_blades:
+        return chassis_list, get_blades_by_chassis(compute_api_instance, chassis_moids) if chassis_moids else {}
+
+    blades_by_chassis = {chassis.moid: getattr(chassis, 'blades', None) or [] for chassis in chassis_list if getattr(chassis, 'moid', None)}
+    for blades in blades_by_chassis.values():
+        for blade in blades:
+            # Without the expansion the server returns bare mo.MoRef entries that carry no SlotId
+            if getattr(blade, 'class_id', None) != 'compute.Blade' or getattr(blade, 'slot_id', MISSING_ATTRIBUTE) is MISSING_ATTRIBUTE:
+                raise BladesNotExpandedError(f"Blade '{getattr(blade, 'moid', 'UnknownMoid')}' was returned as '{getattr(blade, 'class_id', None)}' without SlotId")
+    return chassis_list, blades_by_chassis
+
+def iter_chassis_pages(equipment_api_instance, compute_api_instance):
+    """Yields (chassis_list, blades_by_chassis) for each page of chassis in Intersight.
+
+    Pages are fetched by a background thread, so the next page is already being requested
+    while the caller processes the current one. Falls back to separate blade queries when
+    the Intersight deployment rejects or ignores the $expand on the Blades relationship.
+    """
+    pages = queue.Queue(maxsize=2)
+    stopped = threading.Event()  # Set once the caller stops reading, so the producer never blocks on a full queue
+
+    def put_page(item):
+        """Queues an item for the caller; returns False if the caller stopped reading first."""
+        while not stopped.is_set():
+            try:
+                pages.put(item, timeout=PAGE_QUEUE_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def fetch_pages():
+        expand_blades = True
+        skip = 0
+        last_item = None  # Marks the end of the pages, or carries the exception that stopped them
+        try:
+            while not stopped.is_set():
+                try:
+                    chassis_list, blades_by_chassis = get_chassis_page(equipment_api_instance, compute_api_instance, skip, expand_blades)
+                except intersight.OpenApiException as e:
+                    # Only a rejected query means $expand is unsupported; auth, throttling and server errors are not
+                    if not expand_blades or e.status != 400:
+                        raise
+                    logger.warning("Chassis query with expanded Blades failed (Status: %s, Reason: %s); falling back to separate blade queries.", e.status, e.reason)
+                    expand_blades = False
+                    continue
+                except BladesNotExpandedError as e:
+                    logger.warning("Chassis query did not expand Blades (%s); falling back to separate blade queries.", e)
+                    expand_blades = False
+                    continue
+                logger.info("Fetched %d chassis (offset %d).", len(chassis_list), skip)
+                if chassis_list and not put_page((chassis_list, blades_by_chassis)):
+                    return
+                if len(chassis_list) < CHASSIS_PAGE_SIZE:
+                    break
+                skip += CHASSIS_PAGE_SIZE
+        except Exception as e:
+            last_item = e
+        put_page(last_item)
+
+    producer = threading.Thread(target=fetch_pages, name='chassis-page-fetcher', daemon=True)
+    producer.start()
+    try:
+        while True:
+            page = pages.get()
+            if page is None:
+                break
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        # Also runs when the caller breaks out early, closes the generator or raises while handling a page
+        stopped.set()
+        producer.join()
+
+def _to_cache_record(obj, fields):
+    """Copies the attributes present on an SDK model into a plain, picklable object."""
+    record = SimpleNamespace()
+    for field in fields:
+        value = getattr(obj, field, MISSING_ATTRIBUTE)
+        if value is not MISSING_ATTRIBUTE:
+            setattr(record, field, value)
+    return record
+
+def get_inventory_cache_path(client):
+    """Returns the cache file for the client's endpoint, API key and the query shape."""
+    configuration = client.configuration
+    api_key_id = getattr(configuration.signing_info, 'key_id', None)
+    cache_key = f"{configuration.host}|{api_key_id}|{CHASSIS_SELECT}|{BLADE_SELECT}"
+    digest = hashlib.sha256(cache_key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"chassis_{digest}.pkl")
+
+def load_cached_inventory(cache_path, max_age=None):
+    """Returns (chassis_list, blades_by_chassis) from the cache, or None if missing, unreadable or older than max_age seconds."""
+    try:
+        age = time.time() - os.path.getmtime(cache_path)
+        if max_age is not None and age >= max_age:
+            return None
+        with open(cache_path, 'rb') as cache_file:
+            return pickle.load(cache_file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Ignoring unreadable inventory cache '%s': %s", cache_path, e)
+        return None
+
+def save_cached_inventory(cache_path, chassis_list, blades_by_chassis):
+    """Writes the inventory snapshot to the cache, replacing any previous entry atomically."""
+    snapshot = (
+        [_to_cache_record(chassis, CHASSIS_CACHE_FIELDS) for chassis in chassis_list],
+        {moid: [_to_cache_record(blade, BLADE_CACHE_FIELDS) for blade in blades] for moid, blades in blades_by_chassis.items()},
+    )
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as cache_file:
+            pickle.dump(snapshot, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning("Could not write inventory cache '%s': %s", cache_path, e)
+
+def describe_api_error(error):
+    """Summarizes an SDK or urllib3 error for log messages."""
+    if isinstance(error, intersight.OpenApiException):
+        return f"Status: {error.status}, Reason: {error.reason}"
+    return f"{type(error).__name__}: {error}"
+
+def iter_inventory(client, cache_ttl=DEFAULT_CACHE_TTL):
+    """Yields (chassis, blades) for every chassis visible to the client.
+
+    Inventories are reused for cache_ttl seconds (0 disables reuse): first from memory when an
+    earlier call in this process fetched it, then from the on-disk cache shared between runs.
+    Otherwise chassis are streamed page by page from Intersight and both caches are refreshed once
+    all pages have been read. If Intersight cannot be queried, a stale cache entry is used instead of failing.
+
+    Arguments:
+        client {intersight.api_client.ApiClient}: client returned by credentials.config_credentials
+        cache_ttl {int}: seconds a cached inventory stays fresh
+    """
+    cache_path = get_inventory_cache_path(client)
+    ttl_bucket = int(time.time() // cache_ttl) if cache_ttl > 0 else None
+    inventory = None
+    if ttl_bucket is not None:
+        memo_bucket, inventory = _recent_inventories.get(cache_path, (None, None))
+        if memo_bucket != ttl_bucket:
+            inventory = load_cached_inventory(cache_path, max_age=cache_ttl)
+        if inventory is not None:
+            logger.info("Using cached inventory for '%s' (younger than %ds).", client.configuration.host, cache_ttl)
+
+    if inventory is None:
+        equipment_api_instance = intersight.api.equipment_api.EquipmentApi(client)
+        compute_api_instance = intersight.api.compute_api.ComputeApi(client)
+        chassis_list, blades_by_chassis = [], {}
+        try:
+            for chassis_page, blades_page in iter_chassis_pages(equipment_api_instance, compute_api_instance):
+                chassis_list.extend(chassis_page)
+                blades_by_chassis.update(blades_page)
+                for chassis in chassis_page:
+                    yield chassis, blades_page.get(getattr(chassis, 'moid', "UnknownMoid"), [])
+        except (intersight.OpenApiException, urllib3.exceptions.HTTPError) as e:
+            # Covers HTTP error responses as well as transport failures (e.g. Intersight unreachable).
+            # Rows for earlier pages have already been handed out, so only fall back before the first page
+            inventory = None if chassis_list else load_cached_inventory(cache_path)
+            if inventory is None:
+                raise
+            logger.warning("Intersight query failed (%s); using stale cached inventory from '%s'.", describe_api_error(e), cache_path)
+        else:
+            if chassis_list:
+                save_cached_inventory(cache_path, chassis_list, blades_by_chassis)
+                if ttl_bucket is not None:
+                    _recent_inventories[cache_path] = (ttl_bucket, (chassis_list, blades_by_chassis))
+            return
+
+    chassis_list, blades_by_chassis = inventory
+    for chassis in chassis_list:
+        yield chassis, blades_by_chassis.get(getattr(chassis, 'moid', "UnknownMoid"), [])